@@ -1,13 +1,16 @@
 from __future__ import annotations
 
+import operator
 from typing import TYPE_CHECKING
-from dataclasses import dataclass
+from string import ascii_letters, digits
+from dataclasses import dataclass, replace
 
 
 if TYPE_CHECKING:
-    from typing import TypeVar, Callable, TypeAlias
+    from typing import Any, TypeVar, Callable, TypeAlias
     from collections.abc import Iterable
 
+
 # Instead of just spending most of the time
 # explaining my own language I thought it
 # would be cooler and more useful if we
@@ -36,29 +39,19 @@ if TYPE_CHECKING:
 # 1. Parser: str -> AST
 # 2. Interpreter: evaluates AST
 
-# How do we represent the raw text?
-
-
-@dataclass
-class Text:
-    chars: str
-    pointer: int = 0
-
-    def get_next(self) -> str | None:
-        try:
-            return self.chars[self.pointer]
-        except IndexError:
-            return None
-        finally:
-            self.pointer += 1
-
-    def decr_pointer(self) -> None:
-        if self.pointer > 0:
-            self.pointer -= 1
+# How do we represent the raw text? We don't need anything fancy for
+# it: the raw string itself plus an integer position ('pos') that
+# tells us how far we've got. A parser reads the chars starting at
+# 'pos' and hands back the position where it stopped together with
+# its result, so the next parser can pick up from there.
+# We encode the raw string to bytes once before parsing: indexing
+# bytes gives us plain ints, so telling a digit or a letter apart
+# is just comparing numbers (mithra only knows ascii digits and
+# letters anyway).
 
 
 if TYPE_CHECKING:
-    # (t: Text) -> T | None
+    # (chars: bytes, pos: int) -> (T | None, new_pos)
     # we use 'None' to indicate failure  for the sake of simplicity
     # but when you're more serious you'd want to use something that
     # can carry error context.
@@ -66,39 +59,46 @@ if TYPE_CHECKING:
     # or 'Either' in haskell which is essentially the inspiration for result type
 
     T = TypeVar("T")
-    Parser: TypeAlias = Callable[[Text], T | None]
+    Parser: TypeAlias = Callable[[bytes, int], tuple[T | None, int]]
 
 # Important: we might want to try a different parser for the same
 # string and we don't want to partially consume the string on a
-# failed attempt, so always reset the  pointer over text when we fail.
-# the 'run_parser' decorater ensures this
+# failed attempt, so always hand back the original position when we fail.
+# the 'run_parser' decorater ensures this. Going through the decorator
+# costs an extra python call for every single parse though, so the
+# parsers below keep their start position around and hand it back
+# themselves (most of them can only fail before consuming anything).
 
 
 def run_parser(parser_f: Parser[T]) -> Parser[T]:
-    def inner(t: Text) -> T | None:
-        before_pointer = t.pointer
-        if (result := parser_f(t)) is None:
-            t.pointer = before_pointer
-        return result
+    def inner(chars: bytes, pos: int) -> tuple[T | None, int]:
+        result, new_pos = parser_f(chars, pos)
+        if result is None:
+            return None, pos
+        return result, new_pos
 
     return inner
 
 
-# Sometimes we're overconsuming the text in which case we have
-# to step back (or decr the pointer) after succession.
-# for instance when we parse a number we have to step outside
-# of the number to identify its final digit.
-# "1234 " -> in this instance we have to consume the " " after "4"
-# to know that the number's last digit is 4.
+# 'parse' is the entry point for parsing a new text: it encodes the
+# text once and runs the parser from the very first byte. It also
+# starts every text with a fresh table of interned variables (see
+# '_interned_variables' below) so the table doesn't grow forever.
+# A parser is happy to stop wherever it can't go any further, so
+# 'parse' checks that the whole text was consumed, otherwise whatever
+# came after that point would just silently disappear.
 
 
-def step_back(parser_f: Parser[T]) -> Parser[T]:
-    def inner(t: Text) -> T | None:
-        if (result := parser_f(t)) is not None:
-            t.decr_pointer()
-        return result
-
-    return inner
+def parse(parser: Parser[T], code: str) -> T | None:
+    _interned_variables.clear()
+    # windows line endings are new lines too
+    chars = code.replace("\r\n", "\n").encode()
+    result, pos = parser(chars, 0)
+    if pos != len(chars):
+        line_no = chars.count(b"\n", 0, pos) + 1
+        line = chars.splitlines()[line_no - 1].decode()
+        raise SyntaxError(f"can't parse line {line_no}: {line!r}")
+    return result
 
 
 # What is AST: some structured and managable representation
@@ -108,23 +108,26 @@ def step_back(parser_f: Parser[T]) -> Parser[T]:
 # actually handle and evaluate
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Function:
     name: str
     args: tuple[str, ...]
     exprs: tuple["AstValue", ...]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class FunctionCall:
     name: str
     arg_exprs: tuple["AstValue", ...]
+    # filled in by 'Interpreter.resolve', see below
+    func_id: int | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Assignment:
     var_name: str
     expr: "AstValue"
+    slot: int | None = None
 
 
 # could be just a str but
@@ -133,9 +136,10 @@ class Assignment:
 # this into this dataclass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Variable:
     name: str
+    slot: int | None = None
 
 
 if TYPE_CHECKING:
@@ -162,68 +166,69 @@ if TYPE_CHECKING:
     # fmt: on
 
 
-@run_parser
-@step_back
-def parse_int(t: Text) -> int | None:
-    int_builder = ""
-    while char := t.get_next():
-        if not char.isdigit():
-            break
-        int_builder += char
-    return int(int_builder) if int_builder else None
+# Instead of building the token char by char (every 'str +=' allocates a
+# brand new string) we just remember where the token started, scan forward
+# while the chars match and slice the token out of the text in one go.
+# Notice that we never consume the char that ends the token, so there's
+# nothing to step back from afterwards.
 
 
-@run_parser
-def parse_string(t: Text) -> str | None:
-    if t.get_next() != '"':
-        return None
-    string_builder = ""
-    while char := t.get_next():
-        if char == '"':
-            break
-        string_builder += char
-    return string_builder
+def parse_int(chars: bytes, pos: int) -> tuple[int | None, int]:
+    start, n = pos, len(chars)
+    # b"0" - b"9"
+    while pos < n and 48 <= chars[pos] <= 57:
+        pos += 1
+    return (int(chars[start:pos]) if pos > start else None), pos
 
 
-@run_parser
-@step_back
-def word(t: Text) -> str | None:
-    word_builder = ""
-    while char := t.get_next():
-        if not char.isalpha():
-            break
-        word_builder += char
-    return word_builder or None
+def parse_string(chars: bytes, pos: int) -> tuple[str | None, int]:
+    if chars[pos : pos + 1] != b'"':
+        return None, pos
+    start = pos + 1
+    # a string can't span lines, without a closing quote on the same
+    # line it's not a string at all
+    end = chars.find(b'"', start)
+    if end == -1 or chars.find(b"\n", start, end) != -1:
+        return None, pos
+    # step over the closing quote
+    return chars[start:end].decode(), end + 1
 
 
-def parse_variable(t: Text) -> Variable | None:
-    if (var_name := word(t)) is None:
-        return None
-    return Variable(var_name)
+def word(chars: bytes, pos: int) -> tuple[str | None, int]:
+    start, n = pos, len(chars)
+    # b"A" - b"Z" or b"a" - b"z"
+    while pos < n and (65 <= chars[pos] <= 90 or 97 <= chars[pos] <= 122):
+        pos += 1
+    return chars[start:pos].decode() or None, pos
 
 
-@run_parser
-def parse_expr(t: Text) -> AstValue | None:
-    # notice how '@run_parser' decorator becomes useful here as it resets the
-    # pointer over the text everytime a previous parser fails.
-    for parser in [parse_int, parse_string, parse_function_call, parse_variable]:
-        if result := parser(t):
-            return result
-    return None
+def parse_expr(chars: bytes, pos: int) -> tuple[AstValue | None, int]:
+    # we could just try every expression parser one after the other until
+    # one of them succeeds, but the first char already tells us which one
+    # can succeed at all: a digit starts an int, '"' starts a string and a
+    # letter starts either a function call or a variable. So we look the
+    # parser up by the first char (see '_first_char_dispatch' below)
+    # instead of letting the wrong ones fail first. This also means that
+    # we never backtrack and parse the same chars twice, so there's no
+    # need to memoize parse results (packrat parsing) either.
+    if pos >= len(chars) or (byte := chars[pos]) >= 128:
+        return None, pos
+    if (parser := _first_char_dispatch[byte]) is None:
+        return None, pos
+    return parser(chars, pos)
 
 
-# parser factory, creates new parser: iterates over
-# the chars of the string and tries to match the next
-# chars of our raw text to the chars of the arg string
+# parser factory, creates new parser: checks whether the
+# next chars of our raw text match the arg string
 
 
 def create_string_parser(string: str) -> Parser[str]:
-    @run_parser
-    def parser(t: Text) -> str | None:
-        for char in string:
-            if char != t.get_next():
-                return None
-        return string
+    literal = string.encode()
+
+    def parser(chars: bytes, pos: int) -> tuple[str | None, int]:
+        if not chars.startswith(literal, pos):
+            return None, pos
+        return string, pos + len(literal)
 
     return parser
 
@@ -242,57 +247,132 @@ if TYPE_CHECKING:
 
 
 def sep_by(main_parser: Parser[T1], sep_parser: Parser[T2]) -> Parser[list[T1]]:
-    @run_parser
-    def parser(t: Text) -> list[T1] | None:
-        if (first := main_parser(t)) is None:
-            return None
+    def parser(chars: bytes, pos: int) -> tuple[list[T1] | None, int]:
+        first, pos = main_parser(chars, pos)
+        if first is None:
+            return None, pos
         results = [first]
         while True:
-            if not sep_parser(t):
+            sep, pos = sep_parser(chars, pos)
+            if sep is None:
                 break
-            if next := main_parser(t):
+            next, pos = main_parser(chars, pos)
+            if next is not None:
                 results.append(next)
-        return results
+        return results, pos
 
     return parser
 
 
-@run_parser
-def parse_function_call(t: Text) -> FunctionCall | None:
-    if (function_name := word(t)) is None:
-        return None
-    if t.get_next() != "(":
-        return None
-    comma_parser: Parser = create_string_parser(", ")
+# a program refers to the same few variables over and over again and
+# 'Variable' is frozen, so every reference to the same name can share
+# one and the same 'Variable' instead of allocating a new one each time
+_interned_variables: dict[str, Variable] = {}
+
+
+# a function call and a variable both start with a word, the only difference
+# is whether an opening parenthesis follows the word or not. So instead of
+# trying to parse a function call and then scanning the very same word
+# again as a variable when that fails, we scan the word once and peek.
+
+
+def parse_word_then_maybe_call(chars: bytes, pos: int) -> tuple[AstValue | None, int]:
+    start = pos
+    name, pos = word(chars, pos)
+    if name is None:
+        return None, start
+    if chars[pos : pos + 1] != b"(":
+        if (var := _interned_variables.get(name)) is None:
+            var = _interned_variables[name] = Variable(name)
+        return var, pos
     # notice how expression parsing becomes recursive at this point because
-    # 'parse_function_call' parses call arg expressions via 'parse_expr'
-    # but 'parse_expr' then calls 'parse_function_call'. This recursivity is
-    # what enables us to parse nested function calls with arbitrary levels of
-    # nesting
-    call_arg_parser: Parser = sep_by(main_parser=parse_expr, sep_parser=comma_parser)
-    if (call_args := call_arg_parser(t)) is None:
-        return None
-    if t.get_next() != ")":
-        return None
-    return FunctionCall(function_name, tuple(call_args))
+    # we parse call arg expressions via 'parse_expr' but 'parse_expr' then
+    # calls 'parse_word_then_maybe_call'. This recursivity is what enables
+    # us to parse nested function calls with arbitrary levels of nesting
+    first_arg, pos = parse_expr(chars, pos + 1)
+    if first_arg is None:
+        return None, start
+    # this is 'sep_by(parse_expr, create_string_parser(", "))' written out by
+    # hand: the separator never changes, so there's no need to build two new
+    # parsers for every single call we parse
+    call_args = [first_arg]
+    while chars.startswith(b", ", pos):
+        arg, pos = parse_expr(chars, pos + 2)
+        if arg is not None:
+            call_args.append(arg)
+    if chars[pos : pos + 1] != b")":
+        return None, start
+    return FunctionCall(name, tuple(call_args)), pos + 1
+
+
+_first_char_parsers: dict[str, Parser[AstValue]] = {
+    **dict.fromkeys(digits, parse_int),
+    '"': parse_string,
+    **dict.fromkeys(ascii_letters, parse_word_then_maybe_call),
+}
+# one entry per ascii char, 'None' means that no expression starts with that char
+_first_char_dispatch: list[Parser[AstValue] | None] = [
+    _first_char_parsers.get(chr(byte)) for byte in range(128)
+]
 
 
 @run_parser
-def parse_list(t: Text) -> list[AstValue] | None:
+def parse_list(chars: bytes, pos: int) -> tuple[list[AstValue] | None, int]:
     # TODO: implement list parser for homework
-    ...
+    return None, pos
+
+
+def parse_assignment(chars: bytes, pos: int) -> tuple[Assignment | None, int]:
+    start = pos
+    var_name, pos = word(chars, pos)
+    if var_name is None:
+        return None, start
+    if not chars.startswith(b" = ", pos):
+        return None, start
+    expr, pos = parse_expr(chars, pos + 3)
+    if expr is None:
+        return None, start
+    return Assignment(var_name, expr), pos
+
+
+# separates two assignments: trailing spaces and tabs, the new line and
+# any number of lines that are empty or just spaces and tabs after it
+# (at the end of the program the new line itself is optional). It
+# always stops at the start of a line (or at the end of the text), so
+# an indented assignment is still a syntax error.
+def parse_line_breaks(chars: bytes, pos: int) -> tuple[str | None, int]:
+    start = end = pos
+    n = len(chars)
+    while True:
+        while pos < n and chars[pos] in b" \t":
+            pos += 1
+        if pos == n:
+            end = n
+            break
+        if chars[pos] != 10:  # b"\n"
+            break
+        pos += 1
+        end = pos
+    # no progress means no separator, 'sep_by' would loop forever otherwise
+    if end == start:
+        return None, start
+    return chars[start:end].decode(), end
 
 
-@run_parser
-def parse_assignment(t: Text) -> Assignment | None:
-    if (var_name := word(t)) is None:
-        return None
-    assignment_parser: Parser = create_string_parser(" = ")
-    if assignment_parser(t) is None:
-        return None
-    if (expr := parse_expr(t)) is None:
-        return None
-    return Assignment(var_name, expr)
+parse_assignments: Parser[list[Assignment]] = sep_by(
+    main_parser=parse_assignment, sep_parser=parse_line_breaks
+)
+
+
+# a program is just assignments separated by new lines, there may be
+# empty lines before the first one too, or no assignments at all.
+# Parsing the whole program in one go (instead of line by line)
+# means that we only encode the source once.
+def parse_program(chars: bytes, pos: int) -> tuple[list[Assignment] | None, int]:
+    _, pos = parse_line_breaks(chars, pos)
+    if pos == len(chars):
+        return [], pos
+    return parse_assignments(chars, pos)
 
 
 # So let's imagine that our programming language
@@ -307,9 +387,7 @@ z = div(y, 5)
 # z = 10 / 5 or 2
 
 # The above code should turn into the following AST:
-exprs: list[Assignment | None] = [
-    parse_assignment(Text(line)) for line in code.splitlines()
-]
+exprs: list[Assignment] | None = parse(parse_program, code)
 assert exprs == [
     # first assignment: x = 5
     Assignment(var_name="x", expr=5),
@@ -338,24 +416,103 @@ if TYPE_CHECKING:
     FunctionName: TypeAlias = str
     Number: TypeAlias = int | float
     NumBinOpFunction: TypeAlias = Callable[[Number, Number], Number]
+    # (opcode, arg)
+    Instruction: TypeAlias = tuple[int, Any]
 
 
-class Interpreter:
-    memory: dict[VarName, AstValue] = {}
-    default_functions: dict[FunctionName, NumBinOpFunction] = {
-        "add": lambda x, y: x + y,
-        "sub": lambda x, y: x - y,
-        "mul": lambda x, y: x * y,
-        "div": lambda x, y: x / y,
-    }
+# opcodes of the stack machine, see 'Interpreter.compile_ast'
+PUSH_CONST, LOAD_VAR, STORE_VAR, CALL_FUNCTION, POP_TOP = range(5)
 
+
+class Interpreter:
+    # every interpreter gets its own memory, so two
+    # interpreters never see each other's variables
+    def __init__(self) -> None:
+        # variables live in a plain list, 'symbols' tells
+        # us which slot of the list belongs to which name
+        self.symbols: dict[VarName, int] = {}
+        self.memory: list[AstValue | None] = []
+        # one resolved 'Variable' per name, shared by all of its references
+        self.resolved_variables: dict[VarName, Variable] = {}
+        # the 'operator' module has all of them implemented in C, no
+        # need to wrap them into python lambdas of our own
+        self.default_functions: dict[FunctionName, NumBinOpFunction] = {
+            "add": operator.add,
+            "sub": operator.sub,
+            "mul": operator.mul,
+            "div": operator.truediv,
+        }
+        self.function_ids: dict[FunctionName, int] = {
+            name: func_id for func_id, name in enumerate(self.default_functions)
+        }
+        self.functions: tuple[NumBinOpFunction, ...] = tuple(
+            self.default_functions.values()
+        )
+
+    # Some parts of a program don't depend on any variable: 'add(1, sub(3, 4))'
+    # is always going to be 0, no matter how many times we run it. So we can
+    # just as well do the work once before running the program and replace
+    # such a function call with its result (this is called constant folding).
+    # y = add(mul(x, 2), add(1, sub(3, 4))) -> y = add(mul(x, 2), 0)
+    def fold(self, expr: AstValue) -> AstValue:
+        if isinstance(assignment := expr, Assignment):
+            return replace(assignment, expr=self.fold(assignment.expr))
+        elif isinstance(f_call := expr, FunctionCall):
+            arg_exprs = tuple(self.fold(arg) for arg in f_call.arg_exprs)
+            if all(isinstance(arg, (int, float)) for arg in arg_exprs):
+                function = self.default_functions[f_call.name]
+                try:
+                    return function(*arg_exprs)  # type: ignore
+                # eg.: 'div(1, 0)', leave it to fail when the program runs
+                except (ArithmeticError, TypeError):
+                    pass
+            return replace(f_call, arg_exprs=arg_exprs)
+        return expr
+
+    # Looking up names in a dict means hashing a str every time we touch a
+    # variable or call a function. Names don't change while the program runs
+    # though, so we can swap every name for an integer slot once, right after
+    # parsing, and 'eval' can then just index into a list or a tuple.
+    # 'eval' expects an AST that went through 'resolve'.
+    def resolve(self, expr: AstValue) -> AstValue:
+        if isinstance(assignment := expr, Assignment):
+            resolved_expr = self.resolve(assignment.expr)
+            slot = self.slot(assignment.var_name)
+            return replace(assignment, expr=resolved_expr, slot=slot)
+        elif isinstance(var := expr, Variable):
+            if (resolved := self.resolved_variables.get(var.name)) is None:
+                resolved = replace(var, slot=self.slot(var.name))
+                self.resolved_variables[var.name] = resolved
+            return resolved
+        elif isinstance(f_call := expr, FunctionCall):
+            arg_exprs = tuple(self.resolve(arg) for arg in f_call.arg_exprs)
+            func_id = self.function_ids[f_call.name]
+            return replace(f_call, arg_exprs=arg_exprs, func_id=func_id)
+        return expr
+
+    def slot(self, var_name: VarName) -> int:
+        if (slot := self.symbols.get(var_name)) is None:
+            slot = self.symbols[var_name] = len(self.memory)
+            self.memory.append(None)
+        return slot
+
+    # only needed to report errors, so a linear search is fine
+    def var_name(self, slot: int) -> VarName:
+        return next(name for name, i in self.symbols.items() if i == slot)
+
+    def variables(self) -> dict[VarName, AstValue | None]:
+        return {name: self.memory[slot] for name, slot in self.symbols.items()}
+
+    # just run the (resolved) code expression by expression and return
+    # the value of the final expression. We don't walk the AST here but
+    # compile it for the stack machine first (see 'compile_ast' below),
+    # so deeply nested expressions don't eat up python's recursion limit
     def run(self, exprs: Iterable[AstValue]) -> AstValue | None:
-        # just evaluate code expression by expression
-        evaluated: AstValue | None = None
-        for expr in exprs:
-            evaluated = self.eval(expr)
-        # return final expression
-        return evaluated
+        return self.run_bytecode(self.compile_ast(exprs))
+
+    # forget the values of all variables but keep their slots
+    def clear_memory(self) -> None:
+        self.memory[:] = [None] * len(self.memory)
 
     # 'eval' is just trying to evaluate higher level
     # forms of AST to the most primitive or bottom level
@@ -364,33 +521,157 @@ class Interpreter:
     # into its most primitive return value. in case of 'add'
     # this would be an int
     def eval(self, expr: AstValue) -> AstValue:
-        # when MithraVal is bottom level primitive val eg.:
-        # str or int then we just return it because it's
-        # already avaluated to the most pimitive level
-        if isinstance(expr, (int, str, float, bool)):
-            return expr
-        elif isinstance(assignment := expr, Assignment):
-            evaluated_expr = self.eval(assignment.expr)
-            self.memory[assignment.var_name] = evaluated_expr
-            return evaluated_expr
-        elif isinstance(var := expr, Variable):
-            return self.memory[var.name]
-        elif isinstance(f_call := expr, FunctionCall):
-            # notice how evaluation becomes recursive here
-            # because we have to evaluate each of the call
-            # argument expressions which themeselves can be
-            # function calls so it becomes recursive
-            # fmt: off
-            evaluated_args: list[Number] = [
-                self.eval(arg) for arg in f_call.arg_exprs
-            ]  # type: ignore # pyright: ignore[reportAssignmentType]
-            # fmt: on
-            function = self.default_functions[f_call.name]
-            return function(*evaluated_args)
+        # instead of asking 'isinstance' one type after the other we
+        # look up the handler for the exact type of the node in one go
+        if (handler := self._DISPATCH.get(type(expr))) is None:
+            raise NotImplementedError
+        return handler(self, expr)
+
+    # when MithraVal is bottom level primitive val eg.:
+    # str or int then we just return it because it's
+    # already avaluated to the most pimitive level
+    def _eval_primitive(self, expr: AstValue) -> AstValue:
+        return expr
+
+    def _eval_assignment(self, assignment: Assignment) -> AstValue:
+        if assignment.slot is None:
+            raise KeyError(assignment.var_name)
+        evaluated_expr = self.eval(assignment.expr)
+        self.memory[assignment.slot] = evaluated_expr
+        return evaluated_expr
+
+    def _eval_variable(self, var: Variable) -> AstValue:
+        # an unresolved variable or one that was never assigned to
+        if var.slot is None or (value := self.memory[var.slot]) is None:
+            raise KeyError(var.name)
+        return value
+
+    def _eval_function_call(self, f_call: FunctionCall) -> AstValue:
+        # notice how evaluation becomes recursive here
+        # because we have to evaluate each of the call
+        # argument expressions which themeselves can be
+        # function calls so it becomes recursive
+        if f_call.func_id is None:
+            raise KeyError(f_call.name)
+        function = self.functions[f_call.func_id]
+        # fmt: off
+        evaluated_args: list[Number] = [
+            self.eval(arg) for arg in f_call.arg_exprs
+        ]  # type: ignore # pyright: ignore[reportAssignmentType]
+        # fmt: on
+        return function(*evaluated_args)
+
+    _DISPATCH: dict[type, Callable[[Interpreter, Any], AstValue]] = {
+        int: _eval_primitive,
+        float: _eval_primitive,
+        str: _eval_primitive,
+        bool: _eval_primitive,
+        Assignment: _eval_assignment,
+        Variable: _eval_variable,
+        FunctionCall: _eval_function_call,
+    }
 
-        raise NotImplementedError
+    # A classic way to get rid of the tree walking (and of the python
+    # recursion that comes with it) is to turn the AST into a flat list of
+    # instructions for a little stack machine. The args of a call are pushed
+    # on the value stack before the call itself (postfix order), so the
+    # machine never has to look back at the tree:
+    # y = add(x, 2) -> LOAD_VAR 0, PUSH_CONST 2, CALL_FUNCTION (0, 2), STORE_VAR 1
+    def compile_ast(self, exprs: Iterable[AstValue]) -> list[Instruction]:
+        code: list[Instruction] = []
+        for expr in exprs:
+            # drop the value of the previous expression, only the
+            # value of the final expression is left on the stack
+            if code:
+                code.append((POP_TOP, None))
+            self.compile_ast_expr(expr, code)
+        return code
+
+    # no recursion here either: 'todo' is our own stack of nodes that still
+    # have to be compiled. An assignment or a call is pushed twice, once to
+    # compile its children and once more ('children_done') to emit its own
+    # instruction after the instructions of its children. Just like 'eval',
+    # it expects an AST that went through 'resolve'.
+    def compile_ast_expr(self, expr: AstValue, code: list[Instruction]) -> None:
+        todo: list[tuple[AstValue, bool]] = [(expr, False)]
+        while todo:
+            expr, children_done = todo.pop()
+            if isinstance(expr, (int, str, float, bool)):
+                code.append((PUSH_CONST, expr))
+            elif isinstance(assignment := expr, Assignment):
+                if assignment.slot is None:
+                    raise KeyError(assignment.var_name)
+                if children_done:
+                    code.append((STORE_VAR, assignment.slot))
+                else:
+                    todo.append((assignment, True))
+                    todo.append((assignment.expr, False))
+            elif isinstance(var := expr, Variable):
+                if var.slot is None:
+                    raise KeyError(var.name)
+                code.append((LOAD_VAR, var.slot))
+            elif isinstance(f_call := expr, FunctionCall):
+                if f_call.func_id is None:
+                    raise KeyError(f_call.name)
+                if children_done:
+                    n_args = len(f_call.arg_exprs)
+                    code.append((CALL_FUNCTION, (f_call.func_id, n_args)))
+                else:
+                    todo.append((f_call, True))
+                    # popped in reverse, so the first arg is compiled first
+                    todo.extend((arg, False) for arg in reversed(f_call.arg_exprs))
+            else:
+                raise NotImplementedError
+
+    # mithra has no jumps (yet), so the instructions always run from
+    # the first to the last one and a plain for loop will do
+    def run_bytecode(self, code: list[Instruction]) -> AstValue | None:
+        stack: list[Any] = []
+        memory, functions = self.memory, self.functions
+        for op, arg in code:
+            if op == PUSH_CONST:
+                stack.append(arg)
+            elif op == LOAD_VAR:
+                # a variable that was never assigned to, just like in 'eval'
+                if (value := memory[arg]) is None:
+                    raise KeyError(self.var_name(arg))
+                stack.append(value)
+            elif op == CALL_FUNCTION:
+                func_id, n_args = arg
+                if n_args == 2:
+                    y = stack.pop()
+                    stack.append(functions[func_id](stack.pop(), y))
+                else:
+                    args = stack[len(stack) - n_args :]
+                    del stack[len(stack) - n_args :]
+                    stack.append(functions[func_id](*args))
+            elif op == STORE_VAR:
+                # assignments evaluate to the assigned value,
+                # so it stays on the stack
+                memory[arg] = stack[-1]
+            elif op == POP_TOP:
+                stack.pop()
+        return stack[-1] if stack else None
 
 
 intepreter = Interpreter()
-intepreter.run((expr for expr in exprs if expr is not None))
-print(intepreter.memory)
+folded = [intepreter.fold(expr) for expr in exprs or []]
+assert folded[1] == Assignment(
+    var_name="y",
+    expr=FunctionCall(
+        name="add",
+        arg_exprs=(FunctionCall(name="mul", arg_exprs=(Variable(name="x"), 2)), 0),
+    ),
+)
+resolved = [intepreter.resolve(expr) for expr in folded]
+evaluated = intepreter.run(resolved)
+variables = intepreter.variables()
+
+# the tree walking 'eval' is the straightforward way of running the
+# same program, starting from an empty memory it has to end up with
+# the very same result
+intepreter.clear_memory()
+assert [intepreter.eval(expr) for expr in resolved][-1] == evaluated
+assert intepreter.variables() == variables
+
+print(variables)